@@ -9,12 +9,11 @@ import os
 from typing import Annotated, Optional
 
 import tempfile
-import requests as http_requests
 
 from task_client import send_parse_task, send_datalab_parse_task, send_fast_parse_task, send_convert_task, send_synthesize_task, send_ingest_email_task, client_app
 from email_alerts import setup_email_logging, send_alert
 from fast_parser import classify_pdf
-from worker_utils import initialize_supabase, get_file_info
+from worker_utils import initialize_supabase, get_file_info, download_file
 from prometheus_fastapi_instrumentator import Instrumentator
 
 # Configure logging
@@ -202,14 +201,10 @@ def _triage_pdf(file_id: str) -> str:
             logger.warning(f"Triage: could not get file info for {file_id}, defaulting to complex")
             return "complex"
 
-        response = http_requests.get(file_info.signed_url, timeout=30)
-        response.raise_for_status()
-
         temp_file = tempfile.NamedTemporaryFile(
             prefix=f"triage_{file_id}_", suffix=".pdf", delete=False
         ).name
-        with open(temp_file, "wb") as f:
-            f.write(response.content)
+        download_file(file_info.signed_url, temp_file, timeout=30)
 
         classification = classify_pdf(temp_file)
         logger.info(f"Triage result for {file_id}: {classification}")
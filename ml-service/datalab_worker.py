@@ -1,3 +1,4 @@
+import contextlib
 import html as html_module
 import os
 import gc
@@ -5,7 +6,6 @@ import logging
 import re
 import time
 from celery import Celery
-import requests
 from pypdf import PdfReader
 
 import worker_utils as wu
@@ -13,6 +13,7 @@ from email_alerts import setup_email_logging, register_celery_failure_handler
 from prometheus_client import Counter, Histogram, start_http_server
 from worker_utils import (
     get_file_info,
+    download_file,
     create_parsing_record,
     update_parsing_progress,
     finalize_parsing,
@@ -228,7 +229,7 @@ def _dev_mode_parse(file_id, parsing_id, task_id):
     logger.info(f"[DEV MODE] Stub parse complete for file {file_id}")
 
 
-@app.task()
+@app.task(ignore_result=True)
 def parse_pdf_datalab_task(file_id):
     start = time.time()
     task_id = parse_pdf_datalab_task.request.id
@@ -268,12 +269,7 @@ def parse_pdf_datalab_task(file_id):
 
         # Download PDF
         logger.info(f"Downloading PDF from signed URL for file {file_id}")
-        response = requests.get(file_info.signed_url, timeout=120)
-        response.raise_for_status()
-
-        temp_file = f"/tmp/datalab_{task_id}.pdf"
-        with open(temp_file, "wb") as f:
-            f.write(response.content)
+        temp_file = download_file(file_info.signed_url, f"/tmp/datalab_{task_id}.pdf")
 
         # Count pages and check quota
         reader = PdfReader(temp_file)
@@ -402,8 +398,6 @@ def parse_pdf_datalab_task(file_id):
     finally:
         celery_tasks_total.labels(task_name='parse_pdf_datalab_task', status=_status).inc()
         celery_task_duration_seconds.labels(task_name='parse_pdf_datalab_task').observe(time.time() - _metric_start)
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+        if temp_file:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_file)
@@ -4,11 +4,11 @@ Consumes fast_parse_queue. Handles simple, native-text PDFs without GPU.
 Falls back to GPU parse_queue if extraction validation fails.
 """
 
+import contextlib
 import os
 import logging
 import time
 from celery import Celery
-import requests
 from pypdf import PdfReader
 
 import worker_utils as wu
@@ -21,6 +21,7 @@ from fast_parser import (
 from prometheus_client import Counter, Histogram, start_http_server
 from worker_utils import (
     get_file_info,
+    download_file,
     create_parsing_record,
     update_parsing_progress,
     finalize_parsing,
@@ -99,7 +100,7 @@ def _reroute_to_gpu(file_id, parsing_id):
     send_parse_task(file_id)
 
 
-@app.task()
+@app.task(ignore_result=True)
 def fast_parse_pdf_task(file_id):
     """Parse a simple PDF using PyMuPDF (no GPU required).
 
@@ -139,12 +140,7 @@ def fast_parse_pdf_task(file_id):
 
         # Download PDF
         logger.info(f"Downloading PDF from signed URL for file {file_id}")
-        response = requests.get(file_info.signed_url, timeout=120)
-        response.raise_for_status()
-
-        temp_file = f"/tmp/fast_parse_{task_id}.pdf"
-        with open(temp_file, "wb") as f:
-            f.write(response.content)
+        temp_file = download_file(file_info.signed_url, f"/tmp/fast_parse_{task_id}.pdf")
 
         update_parsing_progress(parsing_id, 10, supabase=supabase)
 
@@ -269,8 +265,6 @@ def fast_parse_pdf_task(file_id):
     finally:
         celery_tasks_total.labels(task_name='fast_parse_pdf_task', status=_status).inc()
         celery_task_duration_seconds.labels(task_name='fast_parse_pdf_task').observe(time.time() - _metric_start)
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except Exception:
-                pass
+        if temp_file:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_file)
@@ -1,13 +1,14 @@
+import hashlib
 import os
 import gc
 import logging
+import subprocess
+import threading
 from celery import Celery
 import time
 import re
 
 import numpy as np
-import soundfile as sf
-from pydub import AudioSegment
 
 import worker_utils as wu
 from email_alerts import setup_email_logging, register_celery_failure_handler
@@ -15,8 +16,11 @@ from prometheus_client import Counter, Histogram, start_http_server
 from worker_utils import (
     get_file_info,
     get_parsed_text,
-    create_conversion_record,
+    create_conversion_started,
     update_conversion_progress,
+    update_conversion_progress_async,
+    pcm16_bytes,
+    encode_mp3,
     finalize_conversion,
     upload_audio_file,
     generate_output_file_path,
@@ -78,6 +82,13 @@ register_celery_failure_handler(app)
 KITTEN_MODEL = "KittenML/kitten-tts-micro-0.8"
 KITTEN_VOICE = os.environ.get("KITTEN_VOICE", "Bruno")
 KITTEN_SAMPLE_RATE = 24000
+# Chunk size is the batching knob for full-document conversion: KittenTTS
+# only exposes single-call generate, so larger chunks amortize per-call
+# ONNX session overhead at the cost of longer time-to-first-audio.
+KITTEN_MAX_CHUNK_CHARS = int(os.environ.get("KITTEN_MAX_CHUNK_CHARS", 500))
+
+# Compiled once — split_text_into_chunks runs over multi-MB book texts
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
 
 logger.info(f"Loading KittenTTS model: {KITTEN_MODEL} (voice: {KITTEN_VOICE})...")
 from kittentts import KittenTTS
@@ -90,13 +101,26 @@ def silence(seconds, sr=KITTEN_SAMPLE_RATE):
     return np.zeros(int(seconds * sr), dtype=np.float32)
 
 
-def split_text_into_chunks(text, max_chars=500):
+def trim_silence(audio, threshold=1e-3):
+    """Strip leading/trailing near-silence from a generated chunk.
+
+    KittenTTS pads its output with silence on both ends; we insert our own
+    inter-chunk gap anyway, so the padding only inflates encode and upload
+    time. Keeps everything between the first and last sample above threshold.
+    """
+    loud = np.flatnonzero(np.abs(audio) > threshold)
+    if loud.size == 0:
+        return audio
+    return audio[loud[0]:loud[-1] + 1]
+
+
+def split_text_into_chunks(text, max_chars=KITTEN_MAX_CHUNK_CHARS):
     """Split text into chunks suitable for TTS generation.
 
     Splits on sentence boundaries (. ! ?) to keep chunks natural-sounding,
     staying under max_chars per chunk.
     """
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    sentences = _SENTENCE_SPLIT_RE.split(text.strip())
     chunks = []
     current_chunk = ""
 
@@ -115,13 +139,11 @@ def split_text_into_chunks(text, max_chars=500):
     return chunks
 
 
-@app.task()
+@app.task(ignore_result=True)
 def convert_to_audio_task(file_id):
     start = time.time()
     task_id = convert_to_audio_task.request.id
     conversion_id = None
-    temp_wav_file = None
-    temp_mp3_file = None
     _metric_start = time.time()
     _status = 'success'
     try:
@@ -139,48 +161,91 @@ def convert_to_audio_task(file_id):
 
         logger.info(f"Retrieved parsed text ({len(parsed_text)} characters)")
 
-        # Create conversion record in database
-        conversion_id = create_conversion_record(file_id, task_id, supabase=supabase)
+        # Create conversion record in database (already status='running')
+        conversion_id = create_conversion_started(file_id, task_id, supabase=supabase)
         if not conversion_id:
             logger.warning("Could not create conversion record - continuing without database tracking")
 
-        update_conversion_progress(conversion_id, 10, "running", supabase=supabase)
-
         # Split text into chunks for TTS generation
         chunks = split_text_into_chunks(parsed_text)
         logger.info(f"Split text into {len(chunks)} chunks for TTS generation")
 
-        # Generate audio for each chunk
-        audio_segments = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Generating audio for chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-            audio = tts_model.generate(chunk, voice=KITTEN_VOICE)
-            audio_segments.append(audio)
-            audio_segments.append(silence(0.75))
-
-            # Update progress (10% to 80% range for generation)
-            progress = 10 + int((i + 1) / len(chunks) * 70)
-            update_conversion_progress(conversion_id, progress, supabase=supabase)
-
-        # Concatenate all audio
-        combined_audio = np.concatenate(audio_segments, axis=0)
-        duration_secs = len(combined_audio) / KITTEN_SAMPLE_RATE
+        # Generate audio for each chunk, piping raw PCM straight into
+        # ffmpeg's MP3 encoder so neither a WAV intermediate nor the
+        # combined audio ever exists. MP3 bytes come back out on stdout
+        # (drained by a thread to avoid pipe deadlock) and go straight to
+        # Supabase — the task never touches disk. Textbooks repeat short
+        # chunks (chapter headers, "See Figure 3.", etc.), so cache
+        # generated audio by content hash and reuse it for duplicates
+        # instead of re-running TTS.
+        ffmpeg = subprocess.Popen(
+            ["ffmpeg", "-f", "s16le", "-ar", str(KITTEN_SAMPLE_RATE), "-ac", "1",
+             "-i", "pipe:0", "-c:a", "libmp3lame", "-q:a", "4", "-threads", "0",
+             "-f", "mp3", "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        mp3_buf = bytearray()
+
+        def _drain_mp3():
+            while True:
+                data = ffmpeg.stdout.read(1 << 20)
+                if not data:
+                    break
+                mp3_buf.extend(data)
+
+        drain_thread = threading.Thread(target=_drain_mp3, daemon=True)
+        drain_thread.start()
+        try:
+            chunk_cache = {}
+            cache_hits = 0
+            total_samples = 0
+            gap = silence(0.75)
+            gap_pcm = pcm16_bytes(gap)
+            for i, chunk in enumerate(chunks):
+                chunk_hash = hashlib.sha256(chunk.encode()).hexdigest()
+                audio = chunk_cache.get(chunk_hash)
+                if audio is None:
+                    logger.info(f"Generating audio for chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
+                    audio = trim_silence(tts_model.generate(chunk, voice=KITTEN_VOICE))
+                    chunk_cache[chunk_hash] = audio
+                else:
+                    cache_hits += 1
+                    logger.info(f"Reusing cached audio for duplicate chunk {i+1}/{len(chunks)}")
+                ffmpeg.stdin.write(pcm16_bytes(audio))
+                ffmpeg.stdin.write(gap_pcm)
+                total_samples += len(audio) + len(gap)
+
+                # Update progress (10% to 80% range for generation) without
+                # blocking the generate loop on the Supabase round-trip
+                progress = 10 + int((i + 1) / len(chunks) * 70)
+                update_conversion_progress_async(conversion_id, progress, supabase=supabase)
+
+            ffmpeg.stdin.close()
+            if ffmpeg.wait() != 0:
+                raise Exception(f"ffmpeg MP3 encode failed with exit code {ffmpeg.returncode}")
+            drain_thread.join()
+        finally:
+            # If generation raised (or the soft time limit fired) mid-loop,
+            # ffmpeg is still blocked on its open stdin — kill it so neither
+            # the process nor the drain thread outlives the task.
+            if ffmpeg.poll() is None:
+                try:
+                    ffmpeg.stdin.close()
+                except OSError:
+                    pass
+                ffmpeg.kill()
+                ffmpeg.wait()
+                drain_thread.join()
+        audio_data = bytes(mp3_buf)
+
+        if cache_hits:
+            logger.info(f"Chunk cache saved {cache_hits}/{len(chunks)} TTS generations")
+
+        duration_secs = total_samples / KITTEN_SAMPLE_RATE
         logger.info(f"Generated {duration_secs:.1f}s of audio")
 
-        temp_wav_file = f"/tmp/audio_{task_id}.wav"
-        logger.info(f"Saving combined audio to {temp_wav_file}")
-        sf.write(temp_wav_file, combined_audio, KITTEN_SAMPLE_RATE)
-
-        temp_mp3_file = f"/tmp/audio_{task_id}.mp3"
-        logger.info(f"Converting WAV to MP3: {temp_mp3_file}")
-        audio_segment = AudioSegment.from_wav(temp_wav_file)
-        audio_segment.export(temp_mp3_file, format="mp3", parameters=["-q:a", "4"])
-        del audio_segment
-        del combined_audio
-
-        file_size_bytes = os.path.getsize(temp_mp3_file)
-        file_size_mb = file_size_bytes / (1024 * 1024)
-        logger.info(f"MP3 file size: {file_size_mb:.2f} MB")
+        file_size_mb = len(audio_data) / (1024 * 1024)
+        logger.info(f"MP3 size: {file_size_mb:.2f} MB")
         if file_size_mb > 50:
             error_msg = f"MP3 file size ({file_size_mb:.2f} MB) exceeds Supabase free plan limit of 50 MB"
             logger.error(error_msg)
@@ -190,11 +255,8 @@ def convert_to_audio_task(file_id):
 
         update_conversion_progress(conversion_id, 85, supabase=supabase)
 
-        # Upload MP3 file to Supabase storage
-        logger.info("Uploading MP3 file to Supabase storage")
-        with open(temp_mp3_file, "rb") as audio_file:
-            audio_data = audio_file.read()
-
+        # Upload MP3 bytes to Supabase storage
+        logger.info("Uploading MP3 to Supabase storage")
         output_file_path = generate_output_file_path(file_info.user_id, file_info.file_name or "converted_audio")
         update_conversion_progress(conversion_id, 95, supabase=supabase)
 
@@ -209,12 +271,6 @@ def convert_to_audio_task(file_id):
 
         gc.collect()
 
-        # Clean up temporary files
-        if temp_wav_file and os.path.exists(temp_wav_file):
-            os.remove(temp_wav_file)
-        if temp_mp3_file and os.path.exists(temp_mp3_file):
-            os.remove(temp_mp3_file)
-
         update_conversion_progress(conversion_id, 100, supabase=supabase)
 
         end = time.time()
@@ -244,18 +300,6 @@ def convert_to_audio_task(file_id):
             except:
                 pass
 
-        # Clean up temporary files
-        if temp_wav_file and os.path.exists(temp_wav_file):
-            try:
-                os.remove(temp_wav_file)
-            except:
-                pass
-        if temp_mp3_file and os.path.exists(temp_mp3_file):
-            try:
-                os.remove(temp_mp3_file)
-            except:
-                pass
-
         raise e
     finally:
         celery_tasks_total.labels(task_name='convert_to_audio_task', status=_status).inc()
@@ -264,25 +308,14 @@ def convert_to_audio_task(file_id):
 
 @app.task()
 def synthesize_sentence_task(text, sentence_id=None, user_id=None):
-    temp_wav_file = None
-    temp_mp3_file = None
-    task_id = synthesize_sentence_task.request.id
     _metric_start = time.time()
     _status = 'success'
     try:
         audio = tts_model.generate(text, voice=KITTEN_VOICE)
         duration_secs = len(audio) / KITTEN_SAMPLE_RATE
 
-        temp_wav_file = f"/tmp/sentence_{task_id}.wav"
-        sf.write(temp_wav_file, audio, KITTEN_SAMPLE_RATE)
-
-        temp_mp3_file = f"/tmp/sentence_{task_id}.mp3"
-        audio_segment = AudioSegment.from_wav(temp_wav_file)
-        audio_segment.export(temp_mp3_file, format="mp3", parameters=["-q:a", "4"])
-        del audio_segment
-
-        with open(temp_mp3_file, "rb") as f:
-            audio_bytes = f.read()
+        # Encode in memory via ffmpeg pipes — no WAV/MP3 temp files
+        audio_bytes = encode_mp3(pcm16_bytes(audio), KITTEN_SAMPLE_RATE)
 
         # Upload to storage and return only the path — the audio blob never
         # touches the Celery result backend (Postgres).
@@ -299,7 +332,3 @@ def synthesize_sentence_task(text, sentence_id=None, user_id=None):
     finally:
         celery_tasks_total.labels(task_name='synthesize_sentence_task', status=_status).inc()
         celery_task_duration_seconds.labels(task_name='synthesize_sentence_task').observe(time.time() - _metric_start)
-        if temp_wav_file and os.path.exists(temp_wav_file):
-            os.remove(temp_wav_file)
-        if temp_mp3_file and os.path.exists(temp_mp3_file):
-            os.remove(temp_mp3_file)
@@ -1,5 +1,7 @@
 
 import base64
+import contextlib
+import functools
 import gc
 import logging
 import os
@@ -7,7 +9,6 @@ import re
 import time
 from datetime import datetime
 from celery import Celery
-import requests
 from pypdf import PdfReader
 from supabase import create_client, Client
 import worker_utils as wu
@@ -15,8 +16,10 @@ from email_alerts import setup_email_logging, register_celery_failure_handler
 from prometheus_client import Counter, Histogram, start_http_server
 from worker_utils import (
     get_file_info,
+    download_file,
     create_parsing_record,
     update_parsing_progress,
+    update_parsing_progress_async,
     finalize_parsing,
     clean_markdown_for_tts,
     split_and_merge_sentences,
@@ -76,6 +79,11 @@ register_celery_failure_handler(app)
 
 supabase = wu.initialize_supabase()
 
+# Let the CUDA caching allocator grow segments instead of carving fixed-size
+# blocks; avoids fragmentation when page workloads vary. Must be set before
+# torch is imported — the allocator reads it once at init.
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
 # Initialize the OCR predictor
 import torch
 from marker.converters.pdf import PdfConverter
@@ -108,6 +116,18 @@ else:
 # Global singleton model instance (initialized at worker startup)
 pdf_converter = None
 
+
+@functools.lru_cache(maxsize=1)
+def get_artifact_dict():
+    """Load the marker model weights (layout, detection, OCR) once per process.
+
+    Cached separately from the converter so rebuilding a PdfConverter (e.g.
+    the on-demand dev-mode path) reuses the already-loaded GPU weights
+    instead of re-reading several GB from disk.
+    """
+    return create_model_dict()
+
+
 def initialize_parser_models():
     """Initialize PDF parsing models (parser worker only)
 
@@ -125,19 +145,18 @@ def initialize_parser_models():
     logger.info("=" * 60)
     logger.info(f"GPU memory before model load: {torch.cuda.memory_allocated() / 1024**3:.2f} GB")
 
-    from marker.converters.pdf import PdfConverter
-    from marker.models import create_model_dict
-
-    # Configure batch sizes to minimize VRAM usage
+    # Batch sizes control how many page crops marker pushes through each
+    # model per forward pass — the main throughput/VRAM trade-off. Defaults
+    # minimize VRAM for the shared dev GPU; override via env on larger cards.
     config = {
-        "recognition_batch_size": 48,
-        "layout_batch_size": 1,
-        "detection_batch_size": 1,
-        "ocr_error_batch_size": 1
+        "recognition_batch_size": int(os.environ.get("MARKER_RECOGNITION_BATCH_SIZE", 48)),
+        "layout_batch_size": int(os.environ.get("MARKER_LAYOUT_BATCH_SIZE", 1)),
+        "detection_batch_size": int(os.environ.get("MARKER_DETECTION_BATCH_SIZE", 1)),
+        "ocr_error_batch_size": int(os.environ.get("MARKER_OCR_ERROR_BATCH_SIZE", 1)),
     }
 
     pdf_converter = PdfConverter(
-        artifact_dict=create_model_dict(),
+        artifact_dict=get_artifact_dict(),
         config=config,
     )
 
@@ -235,7 +254,7 @@ def extract_pages_and_sentences(document):
     return pages_data
 
 
-@app.task()
+@app.task(ignore_result=True)
 def parse_pdf_task(file_id):
     """Parse PDF and extract text, saving to database"""
     logger.info(f"Starting parse_pdf_task for file_id: {file_id}")
@@ -315,7 +334,7 @@ def parse_pdf_task(file_id):
                 markdown_text=dev_text, supabase=supabase
             )
             if page_id:
-                sentences = re.split(r'(?<=[.!?])\s+', dev_text)
+                sentences = wu._SENTENCE_SPLIT_RE.split(dev_text)
                 line_h, margin_x, start_y, spacing = 18, 72, 100, 26
                 rows = []
                 for i, s in enumerate(sentences):
@@ -337,27 +356,13 @@ def parse_pdf_task(file_id):
         logger.info("CUDA device available, proceeding with parsing")
         update_parsing_progress(parsing_id, 5, "running", supabase=supabase)
 
-        # Clear GPU memory at task start to ensure maximum available memory
-        logger.info(f"GPU memory before clearing: allocated={torch.cuda.memory_allocated() / 1024**3:.2f} GB, reserved={torch.cuda.memory_reserved() / 1024**3:.2f} GB")
-        gc.collect()
-        torch.cuda.empty_cache()
-        torch.cuda.empty_cache()  # Call twice to help with fragmentation
-        torch.cuda.ipc_collect()  # Clean up inter-process shared memory
-        torch.cuda.reset_peak_memory_stats()
-        torch.cuda.reset_accumulated_memory_stats()
-        logger.info(f"GPU memory after clearing: allocated={torch.cuda.memory_allocated() / 1024**3:.2f} GB, reserved={torch.cuda.memory_reserved() / 1024**3:.2f} GB")
+        logger.info(f"GPU memory at task start: allocated={torch.cuda.memory_allocated() / 1024**3:.2f} GB, reserved={torch.cuda.memory_reserved() / 1024**3:.2f} GB")
 
         start = time.time()
 
         # Download the file from the signed URL
         logger.info(f"Downloading PDF from signed URL")
-        response = requests.get(file_info.signed_url)
-        response.raise_for_status()
-
-        # Save to temporary file
-        temp_file = f"/tmp/download_{task_id}.pdf"
-        with open(temp_file, "wb") as f:
-            f.write(response.content)
+        temp_file = download_file(file_info.signed_url, f"/tmp/download_{task_id}.pdf")
         logger.info(f"Downloaded PDF to: {temp_file}")
 
         update_parsing_progress(parsing_id, 10, supabase=supabase)
@@ -416,19 +421,23 @@ def parse_pdf_task(file_id):
                 # build_document creates a new provider instance.
                 pdf_converter.config["page_range"] = [page_idx]
 
-                document = pdf_converter.build_document(temp_file)  # full PDF, not extracted page
-                res = renderer(document)
+                # inference_mode skips autograd bookkeeping (version counters,
+                # view tracking) for all marker forwards on this page.
+                with torch.inference_mode():
+                    document = pdf_converter.build_document(temp_file)  # full PDF, not extracted page
+                    res = renderer(document)
                 page_text, _, page_images = text_from_rendered(res)
                 all_page_texts.append(page_text)
 
                 page_data_list = extract_pages_and_sentences(document)
 
-                # Clean up GPU memory
+                # Drop references so the caching allocator can reuse the
+                # page's activations for the next iteration; no empty_cache
+                # here — releasing segments to the driver every page forces
+                # the slow cudaMalloc path on the next one.
                 del res, document
                 if page_images:
                     del page_images
-                gc.collect()
-                torch.cuda.empty_cache()
 
                 # Save page + sentences to DB immediately
                 if page_data_list:
@@ -458,9 +467,10 @@ def parse_pdf_task(file_id):
             except Exception as page_err:
                 logger.error(f"Failed to process page {page_idx}: {page_err}")
 
-            # Update progress: 15% -> 85% proportional to pages
+            # Update progress: 15% -> 85% proportional to pages, off the
+            # critical path so the next page's GPU work starts immediately
             progress = 15 + int(70 * (page_idx + 1) / total_pages)
-            update_parsing_progress(parsing_id, progress, supabase=supabase)
+            update_parsing_progress_async(parsing_id, progress, supabase=supabase)
 
         # Reset page_range so it doesn't affect future calls
         pdf_converter.config.pop("page_range", None)
@@ -495,8 +505,9 @@ def parse_pdf_task(file_id):
         update_parsing_progress(parsing_id, 100, supabase=supabase)
 
         # Clean up temporary file
-        if temp_file and os.path.exists(temp_file):
-            os.remove(temp_file)
+        if temp_file:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_file)
             logger.info(f"Cleaned up temporary file: {temp_file}")
 
         logger.info(f"Parsing completed in {total_time:.2f}s (first page: {time_to_first_page:.2f}s)")
@@ -536,11 +547,9 @@ def parse_pdf_task(file_id):
             logger.warning(f"Error during GPU cleanup: {cleanup_err}")
 
         # Clean up temporary files
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-            except:
-                pass
+        if temp_file:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_file)
 
         raise e
     finally:
@@ -598,19 +607,20 @@ def save_text_as_parsed(file_id, user_id, text, raw_html=None):
 def schedule_presynthesis(file_id):
     """Pre-synthesize first 5 sentences (fire-and-forget to warm TTS model)."""
     try:
-        from task_client import send_synthesize_task
+        from task_client import send_synthesize_batch
         file_row = supabase.table('files').select('user_id') \
             .eq('file_id', file_id).single().execute()
         user_id = file_row.data['user_id'] if file_row.data else None
         sentences = supabase.table('page_sentences').select('sentence_id, text') \
             .eq('file_id', file_id).order('sequence_number').limit(5).execute()
-        for s in (sentences.data or []):
-            send_synthesize_task(s['text'], s['sentence_id'], user_id)
+        if sentences.data:
+            send_synthesize_batch([(s['text'], s['sentence_id'], user_id)
+                                   for s in sentences.data])
     except Exception as e:
         logger.warning(f"Pre-synthesis scheduling failed (non-fatal): {e}")
 
 
-@app.task()
+@app.task(ignore_result=True)
 def ingest_email_task(email_data: dict):
     """Process an inbound email: look up user, create file, parse, pre-synthesize."""
     sender = email_data['sender']
@@ -10,17 +10,16 @@ from prometheus_client import Counter, Histogram, start_http_server
 from worker_utils import (
     get_file_info,
     get_parsed_text,
-    create_conversion_record,
+    create_conversion_started,
     update_conversion_progress,
+    pcm16_bytes,
+    encode_mp3,
     finalize_conversion,
     upload_audio_file,
     generate_output_file_path,
     set_sentence_audio_path
 )
 from supertonic import TTS
-import soundfile as sf
-
-from pydub import AudioSegment
 
 # Configure logging
 logging.basicConfig(
@@ -79,13 +78,12 @@ logger.info("Loading tts...")
 # Default is None -> ORT auto-detects and uses all physical cores.
 text_to_speech = TTS(model_dir="/supertonic/assets", intra_op_num_threads=1, inter_op_num_threads=1)
 
-@app.task()
+
+@app.task(ignore_result=True)
 def convert_to_audio_task(file_id):
     start = time.time()
     task_id = convert_to_audio_task.request.id
     conversion_id = None
-    temp_wav_file = None
-    temp_mp3_file = None
     _metric_start = time.time()
     _status = 'success'
     try:
@@ -104,28 +102,20 @@ def convert_to_audio_task(file_id):
 
         logger.info(f"Retrieved parsed text ({len(parsed_text)} characters)")
 
-        # Create conversion record in database
-        conversion_id = create_conversion_record(file_id, task_id, supabase=supabase)
+        # Create conversion record in database (already status='running')
+        conversion_id = create_conversion_started(file_id, task_id, supabase=supabase)
         if not conversion_id:
             logger.warning("Could not create conversion record - continuing without database tracking")
-
-        update_conversion_progress(conversion_id, 10, "running", supabase=supabase)
         logger.info("Loading supertonic style")
 
         style = text_to_speech.get_voice_style("M3")
         logger.info("Running TTS...")
         wav, duration = text_to_speech.synthesize(parsed_text, style, total_steps=10, speed=1.1, lang="en")
         w = wav[0, : int(text_to_speech.sample_rate * duration[0].item())]
-        temp_wav_file = f"/tmp/audio_{task_id}.wav"
-        logger.info(f"Saving combined audio to {temp_wav_file}")
-        sf.write(temp_wav_file, w, text_to_speech.sample_rate)
-        temp_mp3_file = f"/tmp/audio_{task_id}.mp3"
-        logger.info(f"Converting WAV to MP3: {temp_mp3_file}")
-        audio_segment = AudioSegment.from_wav(temp_wav_file)
-        audio_segment.export(temp_mp3_file, format="mp3", parameters=["-q:a", "4"])
-        del audio_segment  # Free memory after export
-        file_size_bytes = os.path.getsize(temp_mp3_file)
-        file_size_mb = file_size_bytes / (1024 * 1024)
+        # Encode in memory via ffmpeg pipes — no WAV/MP3 temp files
+        logger.info("Encoding audio to MP3")
+        audio_data = encode_mp3(pcm16_bytes(w), text_to_speech.sample_rate)
+        file_size_mb = len(audio_data) / (1024 * 1024)
         logger.info(f"MP3 file size: {file_size_mb:.2f} MB")
         if file_size_mb > 50:
             error_msg = f"MP3 file size ({file_size_mb:.2f} MB) exceeds Supabase free plan limit of 50 MB"
@@ -136,11 +126,8 @@ def convert_to_audio_task(file_id):
 
         update_conversion_progress(conversion_id, 85, supabase=supabase)
 
-        # Upload MP3 file to Supabase storage
-        logger.info("Uploading MP3 file to Supabase storage")
-        with open(temp_mp3_file, "rb") as audio_file:
-            audio_data = audio_file.read()
-
+        # Upload MP3 bytes to Supabase storage
+        logger.info("Uploading MP3 to Supabase storage")
         # Generate output file path
         output_file_path = generate_output_file_path(file_info.user_id, file_info.file_name or "converted_audio")
         update_conversion_progress(conversion_id, 95, supabase=supabase)
@@ -157,12 +144,6 @@ def convert_to_audio_task(file_id):
 
         gc.collect()
 
-        # Clean up temporary files
-        if temp_wav_file and os.path.exists(temp_wav_file):
-            os.remove(temp_wav_file)
-        if temp_mp3_file and os.path.exists(temp_mp3_file):
-            os.remove(temp_mp3_file)
-
         update_conversion_progress(conversion_id, 100, supabase=supabase)
 
         end = time.time()
@@ -194,18 +175,6 @@ def convert_to_audio_task(file_id):
             except:
                 pass
 
-        # Clean up temporary files
-        if temp_wav_file and os.path.exists(temp_wav_file):
-            try:
-                os.remove(temp_wav_file)
-            except:
-                pass
-        if temp_mp3_file and os.path.exists(temp_mp3_file):
-            try:
-                os.remove(temp_mp3_file)
-            except:
-                pass
-
         raise e
     finally:
         celery_tasks_total.labels(task_name='convert_to_audio_task', status=_status).inc()
@@ -245,9 +214,6 @@ def _clean_for_tts(text: str) -> str:
 
 @app.task()
 def synthesize_sentence_task(text, sentence_id=None, user_id=None):
-    temp_wav_file = None
-    temp_mp3_file = None
-    task_id = synthesize_sentence_task.request.id
     _metric_start = time.time()
     _status = 'success'
     try:
@@ -259,16 +225,8 @@ def synthesize_sentence_task(text, sentence_id=None, user_id=None):
         w = wav[0, : int(text_to_speech.sample_rate * duration[0].item())]
         duration_secs = float(duration[0].item())
 
-        temp_wav_file = f"/tmp/sentence_{task_id}.wav"
-        sf.write(temp_wav_file, w, text_to_speech.sample_rate)
-
-        temp_mp3_file = f"/tmp/sentence_{task_id}.mp3"
-        audio_segment = AudioSegment.from_wav(temp_wav_file)
-        audio_segment.export(temp_mp3_file, format="mp3", parameters=["-q:a", "4"])
-        del audio_segment
-
-        with open(temp_mp3_file, "rb") as f:
-            audio_bytes = f.read()
+        # Encode in memory via ffmpeg pipes — no WAV/MP3 temp files
+        audio_bytes = encode_mp3(pcm16_bytes(w), text_to_speech.sample_rate)
 
         # Upload to storage and return only the path — the audio blob never
         # touches the Celery result backend (Postgres).
@@ -285,7 +243,3 @@ def synthesize_sentence_task(text, sentence_id=None, user_id=None):
     finally:
         celery_tasks_total.labels(task_name='synthesize_sentence_task', status=_status).inc()
         celery_task_duration_seconds.labels(task_name='synthesize_sentence_task').observe(time.time() - _metric_start)
-        if temp_wav_file and os.path.exists(temp_wav_file):
-            os.remove(temp_wav_file)
-        if temp_mp3_file and os.path.exists(temp_mp3_file):
-            os.remove(temp_mp3_file)
@@ -104,6 +104,31 @@ def send_synthesize_task(text: str, sentence_id: str = None, user_id: str = None
         queue='synthesize_queue'
     )
 
+def send_synthesize_batch(items: list):
+    """Send many sentence synthesis tasks over one broker connection.
+
+    Publishing each task via send_task acquires a producer per call, so
+    a fanout of N sentences pays N AMQP round-trips. Reusing a single
+    producer from the pool publishes them back-to-back on one channel.
+
+    Args:
+        items: list of (text, sentence_id, user_id) tuples
+
+    Returns:
+        list[AsyncResult]: one result object per published task
+    """
+    logger.info(f"Sending synthesize batch ({len(items)} sentences)")
+    results = []
+    with client_app.producer_pool.acquire(block=True) as producer:
+        for text, sentence_id, user_id in items:
+            results.append(client_app.send_task(
+                SYNTHESIZE_SENTENCE_TASK,
+                args=[text, sentence_id, user_id],
+                queue='synthesize_queue',
+                producer=producer
+            ))
+    return results
+
 def send_ingest_email_task(email_data: dict):
     """Send email ingestion task to parser worker
 
@@ -1,11 +1,22 @@
 from supabase import create_client, Client
+import functools
 import os
 import re
-from collections import namedtuple
+import secrets
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+from dataclasses import dataclass
 import logging
 
+import requests
 
-FileInfo = namedtuple('FileInfo', ['signed_url', 'file_name', 'user_id'])
+
+@dataclass(slots=True, frozen=True)
+class FileInfo:
+    signed_url: str
+    file_name: str
+    user_id: str
 
 # Configure logging
 logging.basicConfig(
@@ -14,8 +25,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=1)
 def initialize_supabase():
-    # Initialize Supabase client
+    # Initialize Supabase client once per process — every call returns the
+    # same client so all helpers share its keep-alive connection pool
+    # instead of re-handshaking TLS.
     supabase_url = os.environ.get("SUPABASE_URL")
     supabase_key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
     if supabase_url and supabase_key:
@@ -28,18 +42,74 @@ def initialize_supabase():
 
 
 
+_RETRY_ATTEMPTS = int(os.environ.get("SUPABASE_RETRY_ATTEMPTS", "3"))
+
+
+def _with_retries(description: str, fn):
+    """Run an idempotent Supabase call, retrying transient failures.
+
+    Exponential backoff (0.5s, 1s, ...) for up to _RETRY_ATTEMPTS attempts,
+    then re-raises for the caller's normal error handling. Only safe for
+    calls that can be repeated — SELECTs, keyed UPDATEs, upserts, idempotent
+    RPCs — never plain INSERTs, whose duplicate errors carry meaning (see
+    create_parsing_record).
+    """
+    delay = 0.5
+    for attempt in range(1, _RETRY_ATTEMPTS + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == _RETRY_ATTEMPTS:
+                raise
+            logger.warning(f"{description} failed (attempt {attempt}/{_RETRY_ATTEMPTS}), retrying in {delay}s: {e}")
+            time.sleep(delay)
+            delay *= 2
+
+
+# file_id -> (FileInfo, expires_at). Signed URLs live 3600s; cache entries
+# expire at 3300s so a cached URL is never handed out near its expiry.
+# Expired entries are evicted on lookup, and inserts past the cap prune
+# oldest-first, so a long-lived worker never retains one entry per file
+# it has ever touched.
+_file_info_cache = {}
+_FILE_INFO_TTL = 3300
+_FILE_INFO_CACHE_MAX = 1024
+
+
+def _cache_file_info(file_id, file_info, expires_at):
+    if len(_file_info_cache) >= _FILE_INFO_CACHE_MAX:
+        now = time.monotonic()
+        for key in [k for k, v in _file_info_cache.items() if now >= v[1]]:
+            _file_info_cache.pop(key, None)
+        while len(_file_info_cache) >= _FILE_INFO_CACHE_MAX:
+            # dicts iterate in insertion order, so this drops the oldest entry
+            _file_info_cache.pop(next(iter(_file_info_cache)))
+    _file_info_cache[file_id] = (file_info, expires_at)
+
+
 def get_file_info(file_id: str, supabase: Client):
     """Get file info and generate signed URL from file_id
 
+    Repeated lookups for the same file (parse retry, conversion right
+    after parsing) are served from an in-process cache while the signed
+    URL is still comfortably valid.
+
     Returns:
-        FileInfo: Named tuple with signed_url, file_name, and user_id, or None if failed
+        FileInfo: Frozen dataclass with signed_url, file_name, and user_id, or None if failed
     """
     if not supabase:
         return None
 
+    cached = _file_info_cache.get(file_id)
+    if cached:
+        if time.monotonic() < cached[1]:
+            logger.info(f"Using cached file info for file_id: {file_id}")
+            return cached[0]
+        _file_info_cache.pop(file_id, None)
+
     try:
         # Query the files table to get file metadata
-        result = supabase.table("files").select("file_id, file_name, file_path, user_id").eq("file_id", file_id).execute()
+        result = supabase.table("files").select("file_name, file_path, user_id").eq("file_id", file_id).execute()
         if not result.data:
             logger.error(f"No file found with file_id: {file_id}")
             return None
@@ -57,13 +127,127 @@ def get_file_info(file_id: str, supabase: Client):
 
         signed_url = signed_url_result.get("signedURL")
         logger.info(f"Generated signed URL for file_id: {file_id}")
-        return FileInfo(signed_url=signed_url, file_name=file_name, user_id=user_id)
+        file_info = FileInfo(signed_url=signed_url, file_name=file_name, user_id=user_id)
+        _cache_file_info(file_id, file_info, time.monotonic() + _FILE_INFO_TTL)
+        return file_info
 
     except Exception as e:
         logger.error(f"Failed to get file info: {e}")
         return None
 
 
+def get_file_infos(file_ids: list, supabase: Client):
+    """Batch variant of get_file_info: two round-trips for any number of files.
+
+    One .in_() select for the metadata, one create_signed_urls call for the
+    URLs — instead of 2×N calls when looping get_file_info. Results also
+    populate the single-file cache.
+
+    Returns:
+        dict: file_id -> FileInfo (missing/failed ids are absent)
+    """
+    if not supabase or not file_ids:
+        return {}
+
+    try:
+        result = supabase.table("files").select("file_id, file_name, file_path, user_id") \
+            .in_("file_id", file_ids).execute()
+        if not result.data:
+            return {}
+
+        paths = [row["file_path"] for row in result.data]
+        signed = supabase.storage.from_("files").create_signed_urls(paths, 3600)
+        url_by_path = {
+            entry.get("path"): entry.get("signedURL")
+            for entry in (signed or [])
+            if entry.get("signedURL")
+        }
+
+        infos = {}
+        expires_at = time.monotonic() + _FILE_INFO_TTL
+        for row in result.data:
+            signed_url = url_by_path.get(row["file_path"])
+            if not signed_url:
+                logger.error(f"Failed to create signed URL for file_path: {row['file_path']}")
+                continue
+            file_info = FileInfo(signed_url=signed_url, file_name=row["file_name"], user_id=row["user_id"])
+            infos[row["file_id"]] = file_info
+            _cache_file_info(row["file_id"], file_info, expires_at)
+        logger.info(f"Batch-resolved file info for {len(infos)}/{len(file_ids)} files")
+        return infos
+
+    except Exception as e:
+        logger.error(f"Failed to get batch file info: {e}")
+        return {}
+
+
+# Shared session so repeated downloads from the same storage host reuse the
+# TCP+TLS connection instead of paying a fresh handshake per task.
+_http_session = requests.Session()
+_http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Hard cap on downloaded file size; a runaway download would otherwise fill
+# /tmp and stall the worker long past its task time limit.
+MAX_DOWNLOAD_BYTES = int(os.environ.get("MAX_DOWNLOAD_BYTES", 200 * 1024 * 1024))
+
+
+def download_file(url: str, dest_path: str, timeout=(5, 120)):
+    """Download a URL to a local path, streaming in 1 MiB chunks.
+
+    Streams straight to disk so large PDFs are never buffered fully in
+    memory. The timeout bounds connect and per-read stalls (a plain GET
+    with no timeout can hang a worker forever), and downloads larger
+    than MAX_DOWNLOAD_BYTES are rejected. Raises requests.HTTPError on a
+    non-2xx response and ValueError on an oversized file; on any failure
+    mid-stream the partial file is removed before re-raising, so callers
+    never have to clean up a path they were never handed.
+    """
+    with _http_session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        content_length = int(response.headers.get("content-length", 0))
+        if content_length > MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"Download too large: {content_length} bytes (limit {MAX_DOWNLOAD_BYTES})")
+        written = 0
+        try:
+            with open(dest_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    written += len(chunk)
+                    if written > MAX_DOWNLOAD_BYTES:
+                        raise ValueError(f"Download exceeded {MAX_DOWNLOAD_BYTES} bytes")
+                    f.write(chunk)
+        except Exception:
+            try:
+                os.unlink(dest_path)
+            except OSError:
+                pass
+            raise
+    return dest_path
+
+
+def pcm16_bytes(audio):
+    """Convert float audio in [-1, 1] to raw signed 16-bit PCM bytes."""
+    # numpy is only installed in the TTS worker images; the slim parser
+    # images import worker_utils too, so keep the import local to the
+    # one helper that needs it.
+    import numpy as np
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def encode_mp3(pcm_bytes: bytes, sample_rate: int) -> bytes:
+    """Encode raw mono s16le PCM to MP3 bytes via ffmpeg pipes.
+
+    Pipes PCM through stdin and reads MP3 from stdout, skipping the
+    WAV-to-disk write and pydub re-parse round trip entirely.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-f", "s16le", "-ar", str(sample_rate), "-ac", "1",
+         "-i", "pipe:0", "-c:a", "libmp3lame", "-q:a", "4", "-threads", "0",
+         "-f", "mp3", "pipe:1"],
+        input=pcm_bytes, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+    )
+    return result.stdout
+
+
 # Parsing helper functions
 def create_parsing_record(file_id: str, job_id: str, supabase):
     """Create a new file parsing record in the database"""
@@ -86,24 +270,98 @@ def create_parsing_record(file_id: str, job_id: str, supabase):
         return None
 
 
+# Last successfully sent (progress, status) per parsing_id, to skip no-op writes
+_last_parsing_update = {}
+
+
 def update_parsing_progress(parsing_id: str, progress: int, status: str = None, supabase=None):
-    """Update the progress and status of a parsing job"""
+    """Update the progress and status of a parsing job.
+
+    Re-sending the values already in the database is skipped outright —
+    coarse parsers tick the same progress integer many times in a row.
+    """
     if not supabase or not parsing_id:
         return False
 
+    if _last_parsing_update.get(parsing_id) == (progress, status):
+        return True
+
     try:
         update_data = {"job_completion": progress}
         if status:
             update_data["status"] = status
 
-        supabase.table("file_parsings").update(update_data).eq("parsing_id", parsing_id).execute()
-        logger.info(f"Updated parsing {parsing_id}: progress={progress}, status={status}")
+        _with_retries(f"update parsing {parsing_id}",
+                      lambda: supabase.table("file_parsings").update(update_data, returning="minimal").eq("parsing_id", parsing_id).execute())
+        if progress >= 100:
+            _last_parsing_update.pop(parsing_id, None)
+        else:
+            _last_parsing_update[parsing_id] = (progress, status)
+        logger.debug("Updated parsing %s: progress=%s, status=%s", parsing_id, progress, status)
         return True
     except Exception as e:
         logger.error(f"Failed to update parsing progress: {e}")
         return False
 
 
+# Fire-and-forget pool for background Supabase calls (progress updates, the
+# storage-owner RPC). This is the only thread pool in the process, so its size
+# caps the worker's concurrent background connections — it defaults to a
+# single thread, which also keeps updates for one job in submission order;
+# stale pending updates are cancelled so the queue never grows beyond one
+# entry per job.
+_update_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SUPABASE_BG_THREADS", "1")),
+    thread_name_prefix="supabase-bg",
+)
+_pending_updates = {}
+
+
+def _submit_progress_update(key, fn, *args):
+    prev = _pending_updates.get(key)
+    if prev is not None:
+        prev.cancel()  # drop a stale queued update; a running one completes
+    fut = _update_executor.submit(fn, *args)
+    _pending_updates[key] = fut
+
+    def _clear(_):
+        # Drop the entry once the future settles (unless a newer one
+        # replaced it) so finished jobs don't accumulate in the dict.
+        if _pending_updates.get(key) is fut:
+            _pending_updates.pop(key, None)
+
+    fut.add_done_callback(_clear)
+
+
+def _drain_pending_update(key):
+    """Cancel or wait out the in-flight background update for a job.
+
+    cancel() only removes a queued future — a running one completes, and
+    with retries it can land seconds later. Called before terminal writes
+    (finalize) so a late background tick can never overwrite them.
+    """
+    fut = _pending_updates.pop(key, None)
+    if fut is not None:
+        fut.cancel()
+        futures_wait([fut])
+
+
+def update_parsing_progress_async(parsing_id: str, progress: int, status: str = None, supabase=None):
+    """Fire-and-forget update_parsing_progress for hot loops.
+
+    The HTTP round-trip happens on a background thread so the caller never
+    blocks; failures are logged inside update_parsing_progress as usual.
+    """
+    _submit_progress_update(("parsing", parsing_id), update_parsing_progress,
+                            parsing_id, progress, status, supabase)
+
+
+def update_conversion_progress_async(conversion_id: str, progress: int, status: str = None, supabase=None):
+    """Fire-and-forget update_conversion_progress for hot loops."""
+    _submit_progress_update(("conversion", conversion_id), update_conversion_progress,
+                            conversion_id, progress, status, supabase)
+
+
 def delete_file_pages(file_id: str, supabase):
     """Delete all file_pages (and cascading page_sentences) for a file.
 
@@ -151,7 +409,7 @@ def create_page_sentences_bulk(sentences: list, supabase=None):
     if not supabase or not sentences:
         return False
     try:
-        supabase.table("page_sentences").insert(sentences).execute()
+        supabase.table("page_sentences").insert(sentences, returning="minimal").execute()
         logger.info(f"Inserted {len(sentences)} sentences")
         return True
     except Exception as e:
@@ -160,37 +418,29 @@ def create_page_sentences_bulk(sentences: list, supabase=None):
 
 
 def finalize_parsing(parsing_id: str, file_id: str, parsed_text: str, status: str = "completed", raw_markdown: str = None, total_time: float = None, time_to_first_page: float = None, supabase=None):
-    """Finalize a parsing job and update the files table with parsed text and raw markdown"""
+    """Finalize a parsing job and update the files table with parsed text and raw markdown.
+
+    Both updates run in one finalize_parsing_tx RPC — a single round-trip
+    and a single transaction, so a reader never sees the parsing marked
+    completed before the file row carries its text.
+    """
     if not supabase or not parsing_id:
         return False
 
-    try:
-        # Update parsing record
-        parsing_update = {
-            "job_completion": 100,
-            "status": status
-        }
-        if total_time is not None:
-            parsing_update["total_time"] = round(total_time, 3)
-        if time_to_first_page is not None:
-            parsing_update["time_to_first_page"] = round(time_to_first_page, 3)
-        supabase.table("file_parsings").update(parsing_update).eq("parsing_id", parsing_id).execute()
-
-        # Update files table with parsed text and raw markdown
-        if status == "completed" and parsed_text:
-            files_update = {
-                "parsed_text": parsed_text,
-                "parsed_at": "NOW()"
-            }
-            # Add raw markdown if provided
-            if raw_markdown:
-                files_update["raw_markdown"] = raw_markdown
-
-            supabase.table("files").update(files_update).eq("file_id", file_id).execute()
-            logger.info(f"Finalized parsing {parsing_id} and updated file {file_id} with parsed text and raw markdown")
-        else:
-            logger.info(f"Finalized parsing {parsing_id} with status {status}")
+    _drain_pending_update(("parsing", parsing_id))
+    _last_parsing_update.pop(parsing_id, None)
 
+    try:
+        _with_retries(f"finalize parsing {parsing_id}", lambda: supabase.rpc("finalize_parsing_tx", {
+            "p_parsing_id": parsing_id,
+            "p_file_id": file_id,
+            "p_parsed_text": parsed_text or "",
+            "p_status": status,
+            "p_raw_markdown": raw_markdown,
+            "p_total_time": round(total_time, 3) if total_time is not None else None,
+            "p_time_to_first_page": round(time_to_first_page, 3) if time_to_first_page is not None else None,
+        }).execute())
+        logger.info(f"Finalized parsing {parsing_id} (status={status}) for file {file_id}")
         return True
     except Exception as e:
         logger.error(f"Failed to finalize parsing: {e}")
@@ -209,11 +459,15 @@ def get_parsed_text(file_id: str, supabase):
         return None
 
     try:
-        result = supabase.table("files").select("parsed_text, parsed_at").eq("file_id", file_id).single().execute()
+        # No .single() here: its not-found APIError would be retried like a
+        # transient failure, but "no parsed text yet" is a normal condition
+        # the convert tasks check for — an empty result returns immediately.
+        result = _with_retries(f"get parsed text for file {file_id}",
+                               lambda: supabase.table("files").select("parsed_text").eq("file_id", file_id).execute())
 
-        if result.data and result.data.get('parsed_text'):
+        if result.data and result.data[0].get('parsed_text'):
             logger.info(f"Retrieved parsed text for file {file_id}")
-            return result.data['parsed_text']
+            return result.data[0]['parsed_text']
         else:
             logger.warning(f"No parsed text found for file {file_id}")
             return None
@@ -222,40 +476,62 @@ def get_parsed_text(file_id: str, supabase):
         return None
 
 
-def create_conversion_record(file_id: str, job_id: str, output_file_path: str = "", supabase=None):
-    """Create a new file conversion record in the database"""
+def create_conversion_started(file_id: str, job_id: str, supabase=None):
+    """Create a conversion record already in the running state.
+
+    Single RPC replacing the insert + first status='running' update pair.
+
+    Returns:
+        str: The conversion_id, or None on failure.
+    """
     if not supabase:
         logger.warning("Supabase not available - skipping database operation")
         return None
 
     try:
-        data = {
-            "file_id": file_id,
-            "job_id": job_id,
-            "file_path": output_file_path,
-            "job_completion": 0,
-            "status": "pending"
-        }
-        result = supabase.table("file_conversions").insert(data).execute()
-        logger.info(f"Created conversion record with ID: {result.data[0]['conversion_id']}")
-        return result.data[0]['conversion_id']
+        result = supabase.rpc("create_conversion_started", {
+            "p_file_id": file_id,
+            "p_job_id": job_id
+        }).execute()
+        logger.info(f"Created conversion record with ID: {result.data}")
+        return result.data
     except Exception as e:
         logger.error(f"Failed to create conversion record: {e}")
         return None
 
 
+# Debounce state for update_conversion_progress: conversion_id -> (ts, progress)
+_last_conversion_update = {}
+
+
 def update_conversion_progress(conversion_id: str, progress: int, status: str = None, supabase=None):
-    """Update the progress and status of a conversion"""
+    """Update the progress and status of a conversion.
+
+    Plain progress ticks are debounced to one round-trip per 2 seconds or
+    10-point delta — the UI polls far less often than the TTS loop reports.
+    Status changes always go through.
+    """
     if not supabase or not conversion_id:
         return False
 
+    now = time.monotonic()
+    if status is None and progress < 100:
+        last = _last_conversion_update.get(conversion_id)
+        if last and (progress == last[1] or (now - last[0] < 2.0 and abs(progress - last[1]) < 10)):
+            return True
+
     try:
         update_data = {"job_completion": progress}
         if status:
             update_data["status"] = status
 
-        supabase.table("file_conversions").update(update_data).eq("conversion_id", conversion_id).execute()
-        logger.info(f"Updated conversion {conversion_id}: progress={progress}, status={status}")
+        _with_retries(f"update conversion {conversion_id}",
+                      lambda: supabase.table("file_conversions").update(update_data, returning="minimal").eq("conversion_id", conversion_id).execute())
+        if progress >= 100:
+            _last_conversion_update.pop(conversion_id, None)
+        else:
+            _last_conversion_update[conversion_id] = (now, progress)
+        logger.debug("Updated conversion %s: progress=%s, status=%s", conversion_id, progress, status)
         return True
     except Exception as e:
         logger.error(f"Failed to update conversion progress: {e}")
@@ -267,13 +543,17 @@ def finalize_conversion(conversion_id: str, output_file_path: str, status: str =
     if not supabase or not conversion_id:
         return False
 
+    _drain_pending_update(("conversion", conversion_id))
+    _last_conversion_update.pop(conversion_id, None)
+
     try:
         update_data = {
             "file_path": output_file_path,
             "job_completion": 100,
             "status": status
         }
-        supabase.table("file_conversions").update(update_data).eq("conversion_id", conversion_id).execute()
+        _with_retries(f"finalize conversion {conversion_id}",
+                      lambda: supabase.table("file_conversions").update(update_data, returning="minimal").eq("conversion_id", conversion_id).execute())
         logger.info(f"Finalized conversion {conversion_id}: {output_file_path}")
         return True
     except Exception as e:
@@ -282,8 +562,33 @@ def finalize_conversion(conversion_id: str, output_file_path: str, status: str =
 
 
 # Storage helper functions
-def upload_audio_file(file_path: str, file_data: bytes, user_id: str, content_type: str = "audio/mpeg", supabase=None):
-    """Upload audio file to Supabase storage with correct owner"""
+def _set_storage_owner(file_path: str, user_id: str, supabase):
+    """Set owner_id on a storage object via the update_storage_owner RPC.
+
+    Failures are logged and swallowed — the upload itself already succeeded.
+    """
+    try:
+        update_result = supabase.rpc("update_storage_owner", {
+            "file_path": file_path,
+            "bucket_name": "files",
+            "new_owner_id": user_id
+        }).execute()
+
+        if update_result.data:
+            logger.info(f"Successfully updated owner_id for file: {file_path}")
+        else:
+            logger.warning(f"Could not update owner_id for file: {file_path}")
+    except Exception as owner_error:
+        logger.error(f"Failed to update owner_id for file {file_path}: {owner_error}")
+
+
+def upload_audio_file(file_path: str, file_data, user_id: str, content_type: str = "audio/mpeg", supabase=None):
+    """Upload audio file to Supabase storage with correct owner.
+
+    file_data may be bytes, an open binary file object, or a local path —
+    the storage client streams file objects/paths in chunks, so passing one
+    avoids materializing the whole blob in memory for large audiobooks.
+    """
     if not supabase:
         logger.warning("Supabase not available - skipping file upload")
         return None
@@ -292,47 +597,22 @@ def upload_audio_file(file_path: str, file_data: bytes, user_id: str, content_ty
         # Upload the audio file
         logger.info(f"Uploading audio file: {file_path} for user: {user_id}")
 
-        try:
-            result = supabase.storage.from_("files").upload(
-                path=file_path,
-                file=file_data,
-                file_options={
-                    "content-type": content_type
-                }
-            )
-        except Exception as upload_error:
-            # If file already exists, try to update it instead
-            if "already exists" in str(upload_error).lower():
-                logger.info(f"File already exists, updating: {file_path}")
-                result = supabase.storage.from_("files").update(
-                    path=file_path,
-                    file=file_data,
-                    file_options={
-                        "content-type": content_type
-                    }
-                )
-            else:
-                raise upload_error
+        # x-upsert makes the upload insert-or-replace in one request, instead
+        # of catching the duplicate error and retrying with .update()
+        result = supabase.storage.from_("files").upload(
+            path=file_path,
+            file=file_data,
+            file_options={
+                "content-type": content_type,
+                "x-upsert": "true"
+            }
+        )
 
         # Since we're using service role, we need to manually set the owner_id
-        # by updating the storage.objects table directly
-        logger.info(f"Setting owner_id for uploaded file: {file_path} to user: {user_id}")
-
-        # Update the owner_id in the storage.objects table using raw SQL
-        try:
-            update_result = supabase.rpc("update_storage_owner", {
-                "file_path": file_path,
-                "bucket_name": "files",
-                "new_owner_id": user_id
-            }).execute()
-
-            if update_result.data:
-                logger.info(f"Successfully updated owner_id for file: {file_path}")
-            else:
-                logger.warning(f"Could not update owner_id for file: {file_path}")
-        except Exception as owner_error:
-            logger.error(f"Failed to update owner_id for file {file_path}: {owner_error}")
-            # Continue anyway - the file was uploaded successfully
+        # by updating the storage.objects table directly. The caller doesn't
+        # depend on it, so it runs on the background executor instead of
+        # adding a round-trip to the upload path.
+        _update_executor.submit(_set_storage_owner, file_path, user_id, supabase)
 
         logger.info(f"Uploaded audio file: {file_path} with owner: {user_id}")
         return file_path
@@ -347,7 +627,8 @@ def set_sentence_audio_path(sentence_id: str, audio_path: str, supabase=None):
         return False
 
     try:
-        supabase.table("page_sentences").update({"audio_path": audio_path}).eq("sentence_id", sentence_id).execute()
+        _with_retries(f"set audio_path for sentence {sentence_id}",
+                      lambda: supabase.table("page_sentences").update({"audio_path": audio_path}, returning="minimal").eq("sentence_id", sentence_id).execute())
         return True
     except Exception as e:
         logger.error(f"Failed to set sentence audio_path for {sentence_id}: {e}")
@@ -356,12 +637,9 @@ def set_sentence_audio_path(sentence_id: str, audio_path: str, supabase=None):
 
 def generate_output_file_path(user_id: str, original_filename: str) -> str:
     """Generate a unique output file path for the converted audio"""
-    import uuid
-    from datetime import datetime
     base_name = original_filename.rsplit(".", 1)[0]
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    return f"{user_id}/{base_name}_{timestamp}_{unique_id}.mp3"
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    return f"{user_id}/{base_name}_{timestamp}_{secrets.token_hex(4)}.mp3"
 
 
 def clean_markdown_for_tts(text: str) -> str:
@@ -416,13 +694,28 @@ def clean_markdown_for_tts(text: str) -> str:
     return text
 
 
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# pysbd handles abbreviations, decimals and quotes that the naive regex
+# splitter mangles; fall back to the regex in images that don't ship it.
+try:
+    import pysbd
+    _SENTENCE_SEGMENTER = pysbd.Segmenter(language="en", clean=False)
+except ImportError:
+    _SENTENCE_SEGMENTER = None
+
+
 def split_and_merge_sentences(text: str, min_length: int = 150) -> list[str]:
     """Split text into sentences and merge short ones.
 
-    Splits on sentence-ending punctuation, then merges consecutive short
-    sentences (< min_length chars) to produce chunks suitable for TTS.
+    Uses pysbd when available (regex fallback otherwise), then merges
+    consecutive short sentences (< min_length chars) to produce chunks
+    suitable for TTS.
     """
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    if _SENTENCE_SEGMENTER is not None:
+        sentences = _SENTENCE_SEGMENTER.segment(text)
+    else:
+        sentences = _SENTENCE_SPLIT_RE.split(text)
     merged = []
     for s in sentences:
         s = s.strip()
@@ -438,9 +731,6 @@ def split_and_merge_sentences(text: str, min_length: int = 150) -> list[str]:
     return merged
 
 
-_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
-
-
 def extract_sentences_from_block(block_text: str, line_texts: list, line_polygons: list) -> list[dict]:
     """Split a text block into sentences and assign per-line bounding boxes.
 
@@ -0,0 +1,22 @@
+-- Migration: Add create_conversion_started RPC
+-- The TTS workers issued an INSERT (status='pending') immediately followed by
+-- an UPDATE to status='running' / job_completion=10 — two round-trips for one
+-- logical operation. This function creates the record already in the running
+-- state and returns its id in a single call.
+
+CREATE OR REPLACE FUNCTION create_conversion_started(
+    p_file_id UUID,
+    p_job_id TEXT
+)
+RETURNS UUID
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+  INSERT INTO file_conversions (file_id, job_id, file_path, job_completion, status)
+  VALUES (p_file_id, p_job_id, '', 10, 'running')
+  RETURNING conversion_id;
+$$;
+
+-- Only service_role should call this
+REVOKE EXECUTE ON FUNCTION create_conversion_started FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_conversion_started TO service_role;
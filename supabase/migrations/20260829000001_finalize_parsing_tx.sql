@@ -0,0 +1,39 @@
+-- Migration: Add finalize_parsing_tx RPC
+-- finalize_parsing issued two sequential UPDATEs (file_parsings, then files)
+-- from the worker — two round-trips, with a visible half-finalized state in
+-- between. This function runs both inside one transaction.
+
+CREATE OR REPLACE FUNCTION finalize_parsing_tx(
+    p_parsing_id UUID,
+    p_file_id UUID,
+    p_parsed_text TEXT,
+    p_status TEXT,
+    p_raw_markdown TEXT DEFAULT NULL,
+    p_total_time NUMERIC DEFAULT NULL,
+    p_time_to_first_page NUMERIC DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    UPDATE file_parsings
+    SET job_completion = 100,
+        status = p_status,
+        total_time = COALESCE(p_total_time, total_time),
+        time_to_first_page = COALESCE(p_time_to_first_page, time_to_first_page)
+    WHERE parsing_id = p_parsing_id;
+
+    IF p_status = 'completed' AND p_parsed_text IS NOT NULL AND p_parsed_text <> '' THEN
+        UPDATE files
+        SET parsed_text = p_parsed_text,
+            raw_markdown = COALESCE(p_raw_markdown, raw_markdown),
+            parsed_at = now()
+        WHERE file_id = p_file_id;
+    END IF;
+END;
+$$;
+
+-- Only service_role should call this
+REVOKE EXECUTE ON FUNCTION finalize_parsing_tx FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION finalize_parsing_tx TO service_role;